@@ -13,4 +13,16 @@ KEYWORD_DB_PATH = "keyword_search.db"
 
 # LangChain Settings
 CHUNK_SIZE = 1500
-CHUNK_OVERLAP = 250
\ No newline at end of file
+CHUNK_OVERLAP = 250
+
+# Index Maintenance Settings
+# FTS5 merges segments once this many share a level (the FTS5 default is 4).
+# A lower value does more merge work while indexing, but leaves fewer segments
+# for every keyword query to scan between maintenance runs.
+FTS_AUTOMERGE_LEVEL = 2
+# Maintenance runs automatically once the app has been idle for this long,
+# but no more often than MAINTENANCE_INTERVAL_SECONDS.
+MAINTENANCE_IDLE_SECONDS = 10 * 60
+MAINTENANCE_INTERVAL_SECONDS = 24 * 60 * 60
+# The time of the last maintenance run is kept here so the interval holds across restarts.
+MAINTENANCE_STATE_FILE = "maintenance.ini"
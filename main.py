@@ -6,11 +6,15 @@ import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog
 import threading
 import queue
+import time
 # Import from all our modules
 from document_processor import process_and_ingest_documents
 from search_engine import perform_search as perform_semantic_search
 from keyword_search_engine import create_db as create_keyword_db, search_sqlite as perform_keyword_search
 from key_manager import save_credentials, load_credentials
+from maintenance import (run_maintenance as perform_maintenance, collect_stats, count_orphans, format_stats,
+                         load_last_maintenance_time, save_last_maintenance_time)
+from config import MAINTENANCE_IDLE_SECONDS, MAINTENANCE_INTERVAL_SECONDS
 
 
 class ApiKeyWindow(tk.Toplevel):
@@ -57,6 +61,12 @@ class App(tk.Tk):
 
         self.source_directory = None
         self.gui_queue = queue.Queue()
+        self.is_busy = False
+        # Held for the whole of a maintenance thread so two passes can never touch the stores at once.
+        self.maintenance_lock = threading.Lock()
+        self.last_activity_time = time.monotonic()
+        self.last_maintenance_time = load_last_maintenance_time()
+        self.last_maintenance_attempt = None
 
         self.menu_bar = tk.Menu(self)
         self.config(menu=self.menu_bar)
@@ -65,6 +75,12 @@ class App(tk.Tk):
         self.menu_bar.add_cascade(label="Settings", menu=settings_menu)
         settings_menu.add_command(label="Set API Credentials...", command=self.open_api_key_window)
 
+        tools_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Tools", menu=tools_menu)
+        tools_menu.add_command(label="Run Index Maintenance", command=self.start_maintenance_thread)
+        tools_menu.add_command(label="Show Index Statistics",
+                               command=lambda: self.start_maintenance_thread(report_only=True))
+
         dir_frame = tk.Frame(self)
         dir_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
         self.dir_label = tk.Label(dir_frame, text="Document Folder: (None Selected)")
@@ -110,6 +126,9 @@ class App(tk.Tk):
 
         self.after(100, self.process_queue)
         self.after(150, self.initial_setup)
+        self.bind_all("<Any-KeyPress>", self.record_activity, add="+")
+        self.bind_all("<Any-ButtonPress>", self.record_activity, add="+")
+        self.after(60 * 1000, self.check_idle_maintenance)
 
     def open_api_key_window(self):
         api_window = ApiKeyWindow(self)
@@ -163,6 +182,13 @@ class App(tk.Tk):
                     self.display_semantic_results(data)
                 elif msg_type == "keyword_results":
                     self.display_keyword_results(data)
+                elif msg_type == "maintenance_results":
+                    self.display_maintenance_results(data)
+                elif msg_type == "maintenance_succeeded":
+                    self.last_maintenance_time = data
+                    save_last_maintenance_time(data)
+                elif msg_type == "confirm_orphan_cleanup":
+                    self.confirm_orphan_cleanup(data)
                 elif msg_type == "enable_buttons":
                     self.toggle_buttons(True)
         except queue.Empty:
@@ -171,6 +197,7 @@ class App(tk.Tk):
             self.after(100, self.process_queue)
 
     def toggle_buttons(self, enabled):
+        self.is_busy = not enabled
         state = tk.NORMAL if enabled else tk.DISABLED
         self.keyword_search_button.config(state=state)
         self.browse_button.config(state=state)
@@ -190,6 +217,7 @@ class App(tk.Tk):
         self.results_text.config(state='disabled')
 
     def start_indexing_thread(self):
+        if self.is_busy: return
         if not self.source_directory:
             messagebox.showwarning("Directory Not Set", "Please select a directory first.")
             return
@@ -210,6 +238,7 @@ class App(tk.Tk):
             self.gui_queue.put(("enable_buttons", True))
 
     def start_semantic_search_thread(self, event=None):
+        if self.is_busy: return
         query = self.semantic_search_entry.get()
         if not query.strip(): return
         self.toggle_buttons(False)
@@ -232,6 +261,7 @@ class App(tk.Tk):
 
 
     def start_keyword_search_thread(self, event=None):
+        if self.is_busy: return
         query = self.keyword_search_entry.get()
         if not query.strip(): return
         self.toggle_buttons(False)
@@ -249,6 +279,94 @@ class App(tk.Tk):
         finally:
             self.gui_queue.put(("enable_buttons", True))
 
+    def record_activity(self, event=None):
+        self.last_activity_time = time.monotonic()
+
+    def check_idle_maintenance(self):
+        now = time.monotonic()
+        idle = now - self.last_activity_time >= MAINTENANCE_IDLE_SECONDS
+        due = (self.last_maintenance_time is None
+               or time.time() - self.last_maintenance_time >= MAINTENANCE_INTERVAL_SECONDS)
+        # A failed run is not recorded as done, so wait another idle period before retrying it.
+        retry_ok = self.last_maintenance_attempt is None or now - self.last_maintenance_attempt >= MAINTENANCE_IDLE_SECONDS
+        if idle and due and retry_ok and not self.is_busy:
+            self.start_maintenance_thread(scheduled=True)
+        self.after(60 * 1000, self.check_idle_maintenance)
+
+    def start_maintenance_thread(self, scheduled=False, report_only=False):
+        if self.is_busy or not self.maintenance_lock.acquire(blocking=False): return
+        if not report_only:
+            self.last_maintenance_attempt = time.monotonic()
+        self.toggle_buttons(False)
+        self.update_status("Collecting index statistics..." if report_only else "Running index maintenance...")
+        threading.Thread(target=self.run_maintenance, args=(scheduled, report_only), daemon=True,
+                         name="MaintenanceThread").start()
+
+    def run_maintenance(self, scheduled, report_only):
+        def status_callback(text):
+            self.gui_queue.put(("status", text))
+
+        api_key, project_id = load_credentials()
+        include_vector_store = bool(api_key and project_id)
+        awaiting_confirmation = False
+        try:
+            if report_only:
+                stats = collect_stats(include_vector_store)
+                status_callback("Index statistics collected.")
+                self.gui_queue.put(("maintenance_results", stats))
+            elif scheduled:
+                self.run_maintenance_pass(status_callback, include_vector_store, scheduled=True)
+            else:
+                status_callback("Checking for files that no longer exist...")
+                orphan_counts = count_orphans(status_callback, include_vector_store)
+                if any(orphan_counts.values()):
+                    # The lock and disabled buttons are handed over to the confirmed pass.
+                    awaiting_confirmation = True
+                    self.gui_queue.put(("confirm_orphan_cleanup", orphan_counts))
+                else:
+                    self.run_maintenance_pass(status_callback, include_vector_store, remove_missing_files=False)
+        except Exception as e:
+            logging.error("An exception occurred in the maintenance thread.", exc_info=True)
+            status_callback(f"Error during index maintenance: {e}")
+        finally:
+            if not awaiting_confirmation:
+                self.maintenance_lock.release()
+                self.gui_queue.put(("enable_buttons", True))
+
+    def confirm_orphan_cleanup(self, orphan_counts):
+        remove_missing_files = messagebox.askyesno(
+            "Remove Missing Files?",
+            f"Remove {orphan_counts['keyword']} keyword rows and {orphan_counts['vector']} vector store chunks "
+            f"for files that no longer exist?\n\n"
+            f"If the document folder is just disconnected, choose No. Removed files must be "
+            f"re-indexed (and re-embedded) to be searchable again.",
+            parent=self)
+        threading.Thread(target=self.run_confirmed_maintenance, args=(remove_missing_files,), daemon=True,
+                         name="MaintenanceThread").start()
+
+    def run_confirmed_maintenance(self, remove_missing_files):
+        def status_callback(text):
+            self.gui_queue.put(("status", text))
+
+        api_key, project_id = load_credentials()
+        try:
+            self.run_maintenance_pass(status_callback, bool(api_key and project_id),
+                                      remove_missing_files=remove_missing_files)
+        except Exception as e:
+            logging.error("An exception occurred in the maintenance thread.", exc_info=True)
+            status_callback(f"Error during index maintenance: {e}")
+        finally:
+            self.maintenance_lock.release()
+            self.gui_queue.put(("enable_buttons", True))
+
+    def run_maintenance_pass(self, status_callback, include_vector_store, scheduled=False, remove_missing_files=True):
+        stats = perform_maintenance(status_callback, include_vector_store=include_vector_store, scheduled=scheduled,
+                                    source_directory=self.source_directory, remove_missing_files=remove_missing_files)
+        if stats["succeeded"]:
+            self.gui_queue.put(("maintenance_succeeded", time.time()))
+        if not scheduled:
+            self.gui_queue.put(("maintenance_results", stats))
+
 
     def display_semantic_results(self, results):
         self.results_text.config(state='normal')
@@ -280,6 +398,27 @@ class App(tk.Tk):
                 self.results_text.insert(tk.END, f"{i + 1}. {path}\n", "keyword_result")
         self.results_text.config(state='disabled')
 
+    def display_maintenance_results(self, stats):
+        self.results_text.config(state='normal')
+        self.results_text.delete('1.0', tk.END)
+        if "before" in stats:
+            self.results_text.insert(tk.END, "Index Maintenance Report\n\n", "header")
+            self.insert_store_stats("Before maintenance:", stats["before"])
+            self.results_text.insert(tk.END, "\n")
+            self.insert_store_stats("After maintenance:", stats["after"])
+        else:
+            self.results_text.insert(tk.END, "Index Statistics\n\n", "header")
+            self.insert_store_stats("Current state:", stats)
+        self.results_text.config(state='disabled')
+
+    def insert_store_stats(self, label, stats):
+        self.results_text.insert(tk.END, f"{label}\n", "source_label")
+        self.results_text.insert(tk.END, format_stats("Keyword index", stats["keyword"]) + "\n", "keyword_result")
+        if "vector" in stats:
+            self.results_text.insert(tk.END, format_stats("Vector store", stats["vector"]) + "\n", "keyword_result")
+        else:
+            self.results_text.insert(tk.END, "Vector store: skipped (API credentials not set)\n", "keyword_result")
+
 
 if __name__ == "__main__":
     try:
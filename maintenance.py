@@ -0,0 +1,334 @@
+import configparser
+import logging
+import os
+import sqlite3
+from config import KEYWORD_DB_PATH, CHROMA_PERSIST_DIRECTORY, FTS_AUTOMERGE_LEVEL, MAINTENANCE_STATE_FILE
+from database import get_vector_store
+
+# Chroma rejects very large delete requests, so orphaned chunks are removed in batches.
+_DELETE_BATCH_SIZE = 500
+
+
+def load_last_maintenance_time():
+    """Returns the wall-clock time of the last maintenance run, or None if it has never run."""
+    try:
+        state = configparser.ConfigParser()
+        state.read(MAINTENANCE_STATE_FILE)
+        return state.getfloat('maintenance', 'last_run', fallback=None)
+    except (configparser.Error, ValueError):
+        logging.error("Could not read maintenance state file.", exc_info=True)
+        return None
+
+
+def save_last_maintenance_time(timestamp):
+    """Records the wall-clock time of a maintenance run."""
+    state = configparser.ConfigParser()
+    state['maintenance'] = {'last_run': str(timestamp)}
+    try:
+        with open(MAINTENANCE_STATE_FILE, 'w') as state_file:
+            state.write(state_file)
+    except OSError:
+        logging.error("Could not write maintenance state file.", exc_info=True)
+
+
+def _sqlite_file_stats(conn):
+    """Returns page counts for an open SQLite connection, including free (fragmented) pages."""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        "size_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist_count,
+        "fragmentation": freelist_count / page_count if page_count else 0.0,
+    }
+
+
+def _directory_size(path):
+    """Returns the total size in bytes of every file below a directory."""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def _select_orphans(entries, root, status_callback, store_name):
+    """
+    Picks the keys of (key, path) entries whose file no longer exists.
+    Entries without a path cannot be checked, so they are never picked.
+    With a root, only entries below that folder are considered, nothing is picked while
+    the folder is unavailable, and nothing is picked if every entry below it looks missing,
+    since that is far more likely to be an unmounted drive than a deleted corpus.
+    """
+    # Many entries share a path (hundreds of chunks per document), so each path is checked once.
+    keys_by_path = {}
+    for key, path in entries:
+        if path:
+            keys_by_path.setdefault(path, []).append(key)
+
+    if root is not None:
+        if not os.path.isdir(root):
+            status_callback(f"Document folder unavailable. Skipping {store_name} cleanup.")
+            return []
+        root_prefix = os.path.join(os.path.realpath(root), "")
+        keys_by_path = {path: keys for path, keys in keys_by_path.items()
+                        if os.path.realpath(path).startswith(root_prefix)}
+
+    missing_paths = [path for path in keys_by_path if not os.path.exists(path)]
+    if root is not None and missing_paths and len(missing_paths) == len(keys_by_path):
+        status_callback(f"Every {store_name} entry looks missing. Skipping cleanup to be safe.")
+        return []
+    return [key for path in missing_paths for key in keys_by_path[path]]
+
+
+def _find_stale_keyword_rows(cursor, root, status_callback):
+    """
+    Returns (duplicate_rowids, orphaned_rowids) for the keyword index. Duplicates are older
+    rows for a path that also has a newer row, left behind because the FTS5 table has no
+    unique key for INSERT OR REPLACE to act on.
+    """
+    cursor.execute("SELECT rowid, path FROM documents ORDER BY rowid DESC")
+    seen_paths = set()
+    latest_rows = []
+    duplicate_rowids = []
+    for rowid, path in cursor.fetchall():
+        if path in seen_paths:
+            duplicate_rowids.append(rowid)
+        else:
+            latest_rows.append((rowid, path))
+        seen_paths.add(path)
+    return duplicate_rowids, _select_orphans(latest_rows, root, status_callback, "keyword index")
+
+
+def _find_orphaned_chunks(vector_store, root, status_callback):
+    """Returns the ids of vector store chunks whose source file no longer exists."""
+    entries = vector_store.get(include=["metadatas"])
+    chunk_sources = [
+        (chunk_id, metadata.get("source") if metadata else None)
+        for chunk_id, metadata in zip(entries["ids"], entries["metadatas"])
+    ]
+    return _select_orphans(chunk_sources, root, status_callback, "vector store")
+
+
+def count_orphans(status_callback, include_vector_store=True):
+    """
+    Counts keyword rows and vector store chunks for files that no longer exist, without
+    removing anything, so a full cleanup can be confirmed first.
+    Returns {"keyword": ..., "vector": ...}; a store that could not be read counts as 0.
+    """
+    counts = {"keyword": 0, "vector": 0}
+    if os.path.exists(KEYWORD_DB_PATH):
+        conn = None
+        try:
+            conn = sqlite3.connect(KEYWORD_DB_PATH)
+            _duplicates, orphans = _find_stale_keyword_rows(conn.cursor(), None, status_callback)
+            counts["keyword"] = len(orphans)
+        except sqlite3.Error:
+            logging.error("Keyword DB error on counting orphans.", exc_info=True)
+        finally:
+            if conn:
+                conn.close()
+    if include_vector_store:
+        try:
+            counts["vector"] = len(_find_orphaned_chunks(get_vector_store(), None, status_callback))
+        except Exception:
+            logging.error("Vector store error on counting orphans.", exc_info=True)
+    return counts
+
+
+def optimize_keyword_db(status_callback):
+    """
+    Compacts the keyword database: merges all FTS5 segments into one,
+    sets the automerge level used for future inserts, then runs VACUUM and ANALYZE.
+    Returns False if the database could not be optimized.
+    """
+    if not os.path.exists(KEYWORD_DB_PATH):
+        status_callback("Keyword database not found. Nothing to optimize.")
+        return True
+    conn = None
+    try:
+        conn = sqlite3.connect(KEYWORD_DB_PATH)
+        c = conn.cursor()
+        status_callback("Merging keyword index segments...")
+        c.execute("INSERT INTO documents(documents, rank) VALUES ('automerge', ?)", (FTS_AUTOMERGE_LEVEL,))
+        c.execute("INSERT INTO documents(documents) VALUES ('optimize')")
+        conn.commit()
+        # VACUUM cannot run inside a transaction, so it goes after the commit.
+        status_callback("Reclaiming free space in keyword database...")
+        c.execute("VACUUM")
+        c.execute("ANALYZE")
+    except sqlite3.Error as e:
+        logging.error("Keyword DB error on optimize.", exc_info=True)
+        status_callback(f"Keyword database optimization failed: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+    return True
+
+
+def remove_orphaned_keyword_rows(status_callback, root=None, remove_missing_files=True):
+    """
+    Deletes older duplicate rows for the same path left behind by re-indexing and,
+    unless remove_missing_files is False, rows whose file no longer exists on disk.
+    See _select_orphans for how `root` limits which missing files are removed.
+    Returns the number of rows removed, or None if the cleanup failed.
+    """
+    if not os.path.exists(KEYWORD_DB_PATH):
+        return 0
+    conn = None
+    try:
+        conn = sqlite3.connect(KEYWORD_DB_PATH)
+        c = conn.cursor()
+        duplicate_rowids, orphaned_rowids = _find_stale_keyword_rows(c, root, status_callback)
+        stale_rowids = duplicate_rowids + orphaned_rowids if remove_missing_files else duplicate_rowids
+        if stale_rowids:
+            c.executemany("DELETE FROM documents WHERE rowid = ?", [(rowid,) for rowid in stale_rowids])
+            conn.commit()
+    except sqlite3.Error as e:
+        logging.error("Keyword DB error on cleanup.", exc_info=True)
+        status_callback(f"Keyword database cleanup failed: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+    status_callback(f"Removed {len(stale_rowids)} stale rows from the keyword index.")
+    return len(stale_rowids)
+
+
+def remove_orphaned_chunks(status_callback, root=None):
+    """
+    Deletes chunks from the vector store whose source file no longer exists on disk.
+    See _select_orphans for how `root` limits which missing files are removed.
+    Returns the number of chunks removed, or None if the cleanup failed.
+    """
+    try:
+        vector_store = get_vector_store()
+        orphaned_ids = _find_orphaned_chunks(vector_store, root, status_callback)
+    except Exception as e:
+        logging.error("Could not read vector store for cleanup.", exc_info=True)
+        status_callback(f"Could not read vector store for cleanup: {e}")
+        return None
+
+    removed = 0
+    try:
+        for start in range(0, len(orphaned_ids), _DELETE_BATCH_SIZE):
+            batch = orphaned_ids[start:start + _DELETE_BATCH_SIZE]
+            vector_store.delete(ids=batch)
+            removed += len(batch)
+    except Exception as e:
+        logging.error("Vector store error on cleanup.", exc_info=True)
+        status_callback(f"Vector store cleanup failed after removing {removed} chunks: {e}")
+        return None
+    status_callback(f"Removed {removed} orphaned chunks from the vector store.")
+    return removed
+
+
+def get_keyword_db_stats():
+    """Returns size, row count and fragmentation figures for the keyword database."""
+    stats = {"exists": os.path.exists(KEYWORD_DB_PATH)}
+    if not stats["exists"]:
+        return stats
+    conn = None
+    try:
+        conn = sqlite3.connect(KEYWORD_DB_PATH)
+        stats.update(_sqlite_file_stats(conn))
+        stats["rows"] = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        stats["unique_paths"] = conn.execute("SELECT COUNT(DISTINCT path) FROM documents").fetchone()[0]
+        # Every non-empty FTS5 segment has at least one entry in the %_idx shadow table.
+        stats["segments"] = conn.execute("SELECT COUNT(DISTINCT segid) FROM documents_idx").fetchone()[0]
+    except sqlite3.Error:
+        logging.error("Keyword DB error on stats.", exc_info=True)
+    finally:
+        if conn:
+            conn.close()
+    return stats
+
+
+def get_vector_store_stats():
+    """Returns size, chunk count and fragmentation figures for the vector store."""
+    stats = {"exists": os.path.isdir(CHROMA_PERSIST_DIRECTORY)}
+    if not stats["exists"]:
+        return stats
+    stats["size_bytes"] = _directory_size(CHROMA_PERSIST_DIRECTORY)
+
+    # Chroma keeps its metadata in a SQLite file; open it read-only so we never contend with the client.
+    chroma_sqlite_path = os.path.join(CHROMA_PERSIST_DIRECTORY, "chroma.sqlite3")
+    if os.path.exists(chroma_sqlite_path):
+        conn = None
+        try:
+            conn = sqlite3.connect(f"file:{chroma_sqlite_path}?mode=ro", uri=True)
+            file_stats = _sqlite_file_stats(conn)
+            stats["free_bytes"] = file_stats["free_bytes"]
+            stats["fragmentation"] = file_stats["fragmentation"]
+        except sqlite3.Error:
+            logging.error("Vector store error on file stats.", exc_info=True)
+        finally:
+            if conn:
+                conn.close()
+
+    try:
+        entries = get_vector_store().get(include=["metadatas"])
+        stats["rows"] = len(entries["ids"])
+        stats["unique_paths"] = len({m["source"] for m in entries["metadatas"] if m and "source" in m})
+    except Exception:
+        logging.error("Vector store error on stats.", exc_info=True)
+    return stats
+
+
+def collect_stats(include_vector_store=True):
+    """Returns the stats of both stores without changing either of them."""
+    stats = {"keyword": get_keyword_db_stats()}
+    if include_vector_store:
+        stats["vector"] = get_vector_store_stats()
+    return stats
+
+
+def format_stats(name, stats):
+    """Formats a stats dictionary as a single human-readable line."""
+    if not stats.get("exists"):
+        return f"{name}: not created yet"
+    parts = [f"{stats.get('size_bytes', 0) / (1024 * 1024):.1f} MB"]
+    if "rows" in stats:
+        parts.append(f"{stats['rows']} rows ({stats.get('unique_paths', 0)} files)")
+    if "segments" in stats:
+        parts.append(f"{stats['segments']} segments")
+    if "fragmentation" in stats:
+        parts.append(f"{stats['fragmentation']:.0%} free pages")
+    return f"{name}: " + ", ".join(parts)
+
+
+def run_maintenance(status_callback, include_vector_store=True, scheduled=False, source_directory=None,
+                    remove_missing_files=True):
+    """
+    Runs the full maintenance pass: garbage-collects both stores, then compacts the keyword database.
+    The vector store steps need OpenAI credentials, so callers without them can skip them.
+
+    A scheduled run has nobody watching it, so it only removes missing files below the
+    selected source_directory, and skips orphan cleanup entirely when none is selected.
+    A manual run removes every missing file, so callers should confirm the numbers from
+    count_orphans first and pass remove_missing_files=False if the user declines.
+
+    Returns the stats of both stores as {"before": ..., "after": ..., "succeeded": ...}.
+    """
+    status_callback("Starting index maintenance...")
+    stats = {"before": collect_stats(include_vector_store)}
+    results = []
+
+    if scheduled and not source_directory:
+        status_callback("No document folder selected. Skipping orphan cleanup.")
+    else:
+        root = source_directory if scheduled else None
+        results.append(remove_orphaned_keyword_rows(status_callback, root, remove_missing_files))
+        if include_vector_store and remove_missing_files:
+            results.append(remove_orphaned_chunks(status_callback, root))
+    results.append(optimize_keyword_db(status_callback))
+
+    stats["after"] = collect_stats(include_vector_store)
+    stats["succeeded"] = all(result is not None and result is not False for result in results)
+    outcome = "Maintenance complete. " if stats["succeeded"] else "Maintenance finished with errors. "
+    status_callback(outcome + format_stats("Keyword index", stats["after"]["keyword"]))
+    return stats
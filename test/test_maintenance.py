@@ -0,0 +1,175 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def maintenance(tmp_path, monkeypatch):
+    """Imports the maintenance module with the keyword database pointed at a temporary file."""
+    # key_manager writes its encryption key to the working directory on import.
+    monkeypatch.chdir(tmp_path)
+    import keyword_search_engine
+    import maintenance
+
+    db_path = str(tmp_path / "keyword_search.db")
+    monkeypatch.setattr(keyword_search_engine, "KEYWORD_DB_PATH", db_path)
+    monkeypatch.setattr(maintenance, "KEYWORD_DB_PATH", db_path)
+    keyword_search_engine.create_db()
+    return maintenance
+
+
+@pytest.fixture
+def docs(tmp_path):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    return folder
+
+
+def make_file(folder, name):
+    path = folder / name
+    path.write_text("content")
+    return str(path)
+
+
+def keyword_paths():
+    import keyword_search_engine
+    conn = sqlite3.connect(keyword_search_engine.KEYWORD_DB_PATH)
+    paths = sorted(row[0] for row in conn.execute("SELECT path FROM documents"))
+    conn.close()
+    return paths
+
+
+class FakeVectorStore:
+    def __init__(self, sources):
+        self.sources = dict(sources)
+        self.delete_calls = []
+
+    def get(self, include):
+        ids = list(self.sources)
+        return {"ids": ids, "metadatas": [{"source": self.sources[i]} if self.sources[i] else {} for i in ids]}
+
+    def delete(self, ids):
+        self.delete_calls.append(list(ids))
+        for chunk_id in ids:
+            del self.sources[chunk_id]
+
+
+def test_cleanup_removes_duplicates_and_missing_files(maintenance, docs):
+    from keyword_search_engine import insert_file_to_sqlite, search_sqlite
+    kept = make_file(docs, "kept.docx")
+    for i in range(7):
+        insert_file_to_sqlite(kept, f"quarterly report version {i}")
+    insert_file_to_sqlite(str(docs / "deleted.docx"), "quarterly report")
+
+    assert maintenance.remove_orphaned_keyword_rows(lambda text: None) == 7
+    assert keyword_paths() == [kept]
+    assert search_sqlite("version 6") == [kept]
+
+
+def test_optimize_merges_segments(maintenance, docs):
+    from keyword_search_engine import insert_file_to_sqlite, search_sqlite
+    for i in range(7):
+        insert_file_to_sqlite(make_file(docs, f"doc{i}.docx"), f"budget forecast {i}")
+    assert maintenance.get_keyword_db_stats()["segments"] > 1
+
+    assert maintenance.optimize_keyword_db(lambda text: None)
+    stats = maintenance.get_keyword_db_stats()
+    assert stats["segments"] == 1
+    assert stats["rows"] == 7
+    assert len(search_sqlite("budget forecast")) == 7
+
+
+def test_run_maintenance_reports_stats_before_and_after(maintenance, docs):
+    from keyword_search_engine import insert_file_to_sqlite
+    path = make_file(docs, "a.docx")
+    for i in range(5):
+        insert_file_to_sqlite(path, f"text {i}")
+
+    stats = maintenance.run_maintenance(lambda text: None, include_vector_store=False)
+    assert stats["succeeded"]
+    assert stats["before"]["keyword"]["rows"] == 5
+    assert stats["before"]["keyword"]["segments"] > 1
+    assert stats["after"]["keyword"]["rows"] == 1
+    assert stats["after"]["keyword"]["segments"] == 1
+
+
+def test_declined_cleanup_keeps_missing_files(maintenance, docs):
+    from keyword_search_engine import insert_file_to_sqlite
+    missing = str(docs / "missing.docx")
+    insert_file_to_sqlite(missing, "old text")
+    insert_file_to_sqlite(missing, "new text")
+
+    assert maintenance.count_orphans(lambda text: None, include_vector_store=False) == {"keyword": 1, "vector": 0}
+    maintenance.run_maintenance(lambda text: None, include_vector_store=False, remove_missing_files=False)
+    assert keyword_paths() == [missing]
+
+
+def test_select_orphans_leaves_entries_without_path(maintenance, docs):
+    entries = [("a", None), ("b", ""), ("c", str(docs / "gone.docx"))]
+    assert maintenance._select_orphans(entries, None, lambda text: None, "test") == ["c"]
+
+
+def test_select_orphans_checks_each_path_once(maintenance, docs, monkeypatch):
+    checked = []
+    real_exists = maintenance.os.path.exists
+    monkeypatch.setattr(maintenance.os.path, "exists", lambda path: checked.append(path) or real_exists(path))
+    entries = [(f"chunk{i}", str(docs / "gone.docx")) for i in range(300)]
+
+    assert len(maintenance._select_orphans(entries, None, lambda text: None, "test")) == 300
+    assert checked == [str(docs / "gone.docx")]
+
+
+def test_scheduled_run_only_removes_missing_files_below_root(maintenance, docs, tmp_path):
+    from keyword_search_engine import insert_file_to_sqlite
+    kept = make_file(docs, "kept.docx")
+    elsewhere = str(tmp_path / "other" / "gone.docx")
+    for path in (kept, str(docs / "gone.docx"), elsewhere):
+        insert_file_to_sqlite(path, "text")
+
+    maintenance.run_maintenance(lambda text: None, include_vector_store=False, scheduled=True,
+                                source_directory=str(docs))
+    assert keyword_paths() == sorted([kept, elsewhere])
+
+
+def test_scheduled_run_skips_cleanup_when_root_unavailable(maintenance, tmp_path, monkeypatch):
+    from keyword_search_engine import insert_file_to_sqlite
+    unmounted = tmp_path / "unmounted"
+    insert_file_to_sqlite(str(unmounted / "a.docx"), "text")
+    vector_store = FakeVectorStore({"c1": str(unmounted / "a.docx")})
+    monkeypatch.setattr(maintenance, "get_vector_store", lambda: vector_store)
+
+    messages = []
+    maintenance.run_maintenance(messages.append, include_vector_store=True, scheduled=True,
+                                source_directory=str(unmounted))
+    assert keyword_paths() == [str(unmounted / "a.docx")]
+    assert vector_store.delete_calls == []
+    assert any("Document folder unavailable" in message for message in messages)
+
+
+def test_scheduled_run_skips_cleanup_when_every_entry_is_missing(maintenance, docs, monkeypatch):
+    from keyword_search_engine import insert_file_to_sqlite
+    paths = [str(docs / f"gone{i}.docx") for i in range(3)]
+    for path in paths:
+        insert_file_to_sqlite(path, "text")
+    vector_store = FakeVectorStore({f"c{i}": path for i, path in enumerate(paths)})
+    monkeypatch.setattr(maintenance, "get_vector_store", lambda: vector_store)
+
+    messages = []
+    maintenance.run_maintenance(messages.append, include_vector_store=True, scheduled=True,
+                                source_directory=str(docs))
+    assert keyword_paths() == sorted(paths)
+    assert vector_store.delete_calls == []
+    assert any("Every keyword index entry looks missing" in message for message in messages)
+    assert any("Every vector store entry looks missing" in message for message in messages)
+
+
+def test_remove_orphaned_chunks_deletes_in_batches(maintenance, docs, monkeypatch):
+    kept = make_file(docs, "kept.docx")
+    sources = {f"gone{i}": str(docs / "gone.docx") for i in range(1200)}
+    sources.update({"kept": kept, "unknown": None})
+    vector_store = FakeVectorStore(sources)
+    monkeypatch.setattr(maintenance, "get_vector_store", lambda: vector_store)
+
+    assert maintenance.remove_orphaned_chunks(lambda text: None) == 1200
+    assert [len(batch) for batch in vector_store.delete_calls] == [500, 500, 200]
+    assert sorted(vector_store.sources) == ["kept", "unknown"]